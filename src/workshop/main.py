@@ -1,8 +1,8 @@
 import asyncio
 
 
-from resolution_agent import create_agent_from_prompt, post_message as post_to_resolution_agent
-from utils import project_client, tc
+from resolution_agent import close_decision_agent, create_agent_from_prompt, post_message as post_to_resolution_agent
+from utils import delete_agent_in_background, project_client, tc, wait_for_cleanup
 
 
 async def main() -> None:
@@ -26,16 +26,22 @@ async def main() -> None:
             resolution_agent_output = await post_to_resolution_agent(thread_id=thread.id, content=resolution_agent_input, agent=agent, thread=thread)
             print("Resolution agent output:", resolution_agent_output)
         finally:
-            # Cleanup the created agent
-            try:
-                project_client.agents.delete_agent(agent.id)
-                print(f"Deleted agent: {agent.id}")
-            except Exception as e:
-                print(f"Error deleting agent: {e}")
+            # Cleanup the created agent and the shared decision agent concurrently,
+            # and let the deletions finish before the client is closed
+            delete_agent_in_background(agent.id)
+            await close_decision_agent()
+            await wait_for_cleanup()
 
 
 if __name__ == "__main__":
     print("Starting async program...")
+    # Use the faster libuv-based event loop when it is installed (not available on Windows)
+    try:
+        import uvloop
+
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     asyncio.run(main())
     print("Program finished.")
 
@@ -1,33 +1,165 @@
+import atexit
+import hashlib
 import os
+import random
+import shelve
+import threading
 import time
 import asyncio
 import logging
+from collections import OrderedDict
 from typing import Tuple
 from datetime import datetime
 
-from azure.ai.agents.models import MessageRole
-from azure.storage.blob import BlobServiceClient
+from azure.ai.agents.models import MessageRole, ResponseFormatJsonSchema, ResponseFormatJsonSchemaType
+from azure.storage.blob.aio import BlobServiceClient
 
 from utils import (
+    ACTIVE_RUN_STATUSES,
     project_client,
     API_DEPLOYMENT_NAME,
-    add_agent_tools,
-    async_reboot_vm,
     toolset,
-    cleanup,
-    AZURE_RESOURCE_GROUP_NAME,
-    AZURE_SUBSCRIPTION_ID,
+    delete_agent_in_background,
+    json_loads,
+    PATH_PREFIX,
+    read_instructions,
 )
 import re
 import json
 
 logger = logging.getLogger(__name__)
 
+# Phrases in a non-JSON LLM reply that indicate abnormalities were found
+_ABNORMALITY_KEYWORDS = ("abnormalities found", "response time")
+
+# Parallel range GETs per log download; only blobs larger than the SDK's first
+# 32 MiB get are split into chunks
+BLOB_DOWNLOAD_CONCURRENCY = 8
+
+# Logs longer than this are reduced to candidate lines before being sent to the LLM,
+# and the reduced log is cut to its most recent lines if it is still longer
+LOG_FILTER_THRESHOLD = 200_000
+# Lines worth showing the LLM: response times of 1000ms or more (as "1500ms" or as a
+# response-time field such as "responsetime=1500"), or failure keywords
+_CANDIDATE_LINE_RE = re.compile(
+    r"\b[1-9]\d{3,}(?:\.\d+)?[ \t]*ms\b|response[ \t_-]*time[^0-9\n]{0,10}[1-9]\d{3,}|error|exception|timeout",
+    re.IGNORECASE,
+)
+
+# Analysis prompt around the log content; joined once per run rather than formatted
+_ANALYSIS_PROMPT_HEADER = """Please analyze the following log file for abnormalities, specifically looking for increased response times (response times > 1000ms are considered abnormal).
+
+Log Content:
+---
+"""
+_ANALYSIS_PROMPT_FOOTER = """
+---
+
+Provide your analysis in the following JSON format:
+{
+    "abnormalities_found": boolean,
+    "application_name": "name of application from logs (if identifiable)",
+    "abnormal_lines": ["line1", "line2", ...],
+    "summary": "brief summary of findings"
+}"""
+
+# Structured output schema for the monitor agent, so replies are always parseable JSON
+_ANALYSIS_RESPONSE_FORMAT = ResponseFormatJsonSchemaType(
+    json_schema=ResponseFormatJsonSchema(
+        name="log_analysis",
+        description="Abnormalities found in an application log",
+        schema={
+            "type": "object",
+            "properties": {
+                "abnormalities_found": {"type": "boolean"},
+                "application_name": {"type": "string"},
+                "abnormal_lines": {"type": "array", "items": {"type": "string"}},
+                "summary": {"type": "string"},
+            },
+            "required": ["abnormalities_found", "application_name", "abnormal_lines", "summary"],
+            "additionalProperties": False,
+        },
+    )
+)
+
+# Analysis runs to try before falling back to keyword matching on an unparseable reply
+ANALYSIS_ATTEMPTS = 3
+
+# Most recent analysis results keyed on a hash of the (filtered) log content, stored
+# with their time.monotonic() timestamp; entries older than the TTL are re-analyzed
+ANALYSIS_LRU_SIZE = 128
+ANALYSIS_TTL_SECONDS = 300
+_ANALYSIS_LRU: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+# Monitor agent shared across workflow runs; each run gets its own thread. It is
+# recreated when the instructions file changes and deleted when the process exits.
+_monitor_agent = None
+_monitor_agent_instructions: str | None = None
+# (event loop, lock) guarding agent creation. An asyncio.Lock is bound to the loop it
+# first waits on, and a periodic script starts a new loop with every asyncio.run(),
+# so the lock is replaced whenever the running loop changes.
+_monitor_agent_lock_state: tuple[asyncio.AbstractEventLoop, asyncio.Lock] | None = None
+
+
+def _monitor_agent_lock() -> asyncio.Lock:
+    """Return the monitor agent lock for the running event loop."""
+    global _monitor_agent_lock_state
+    loop = asyncio.get_running_loop()
+    if _monitor_agent_lock_state is None or _monitor_agent_lock_state[0] is not loop:
+        _monitor_agent_lock_state = (loop, asyncio.Lock())
+    return _monitor_agent_lock_state[1]
+
+
+MONITOR_INSTRUCTIONS_FILE = f"{PATH_PREFIX}instructions/monitor_agent_instructions.txt"
+# Latest analysis result per blob, stored with the ETag and prompt hash it was computed
+# for; kept on disk so it survives restarts
+ANALYSIS_CACHE_FILE = f"{PATH_PREFIX}files/monitor_analysis_cache"
+# dbm backends are not safe for concurrent opens (dbm.dumb loses or corrupts entries,
+# gdbm refuses the second open), so the worker threads take turns on the file
+_analysis_cache_lock = threading.Lock()
+
+
+def _analysis_version(etag: str) -> str:
+    """Identify what an analysis was computed from: the blob ETag, the prompts and the model."""
+    prompt_hash = hashlib.sha256(API_DEPLOYMENT_NAME.encode() if API_DEPLOYMENT_NAME else b"")
+    prompt_hash.update(read_instructions(MONITOR_INSTRUCTIONS_FILE).encode("utf-8"))
+    prompt_hash.update(_ANALYSIS_PROMPT_HEADER.encode("utf-8"))
+    prompt_hash.update(_ANALYSIS_PROMPT_FOOTER.encode("utf-8"))
+    return f"{etag}|{prompt_hash.hexdigest()}"
+
+
+def _load_cached_analysis(blob_path: str, version: str) -> dict | None:
+    """Return the cached analysis for the blob if it was computed for this version."""
+    try:
+        with _analysis_cache_lock, shelve.open(ANALYSIS_CACHE_FILE, flag="r") as cache:
+            entry = cache.get(blob_path)
+    except Exception:
+        # Missing or unreadable cache file
+        return None
+    if isinstance(entry, tuple) and entry[0] == version:
+        return entry[1]
+    return None
+
+
+def _store_cached_analysis(blob_path: str, version: str, analysis_result: dict) -> None:
+    """Persist the blob's latest analysis, replacing older versions that can no longer hit.
+
+    Failures only cost a re-analysis next run.
+    """
+    try:
+        os.makedirs(os.path.dirname(ANALYSIS_CACHE_FILE), exist_ok=True)
+        with _analysis_cache_lock, shelve.open(ANALYSIS_CACHE_FILE) as cache:
+            cache[blob_path] = (version, analysis_result)
+    except Exception as e:
+        logger.warning("Could not write analysis cache: %s", e)
+
+
 async def get_log_from_azure_storage(
     storage_account_url: str,
     container_name: str,
     blob_name: str,
-    sas_token: str
+    sas_token: str,
+    blob_service_client: BlobServiceClient | None = None
 ) -> str:
     """
     Retrieve log file from Azure Storage Account.
@@ -37,26 +169,115 @@ async def get_log_from_azure_storage(
     - container_name: name of the container containing the blob
     - blob_name: name of the blob (e.g., 'AvailabilityLogs.log')
     - sas_token: SAS-token for access to the blob (do NOT hardcode secrets in source)
+    - blob_service_client: optional open client to reuse; if omitted, one is
+      opened and closed for this call
 
     Returns:
     - Full contents of the log file as a string
     """
+    if blob_service_client is None:
+        async with BlobServiceClient(account_url=storage_account_url, credential=sas_token) as client:
+            return await get_log_from_azure_storage(
+                storage_account_url, container_name, blob_name, sas_token, client
+            )
+
     try:
-        # Create a client using the SAS token
-        blob_service_client = BlobServiceClient(account_url=storage_account_url, credential=sas_token)
         blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
 
-        # Download blob contents
-        download_stream = blob_client.download_blob()
-        content = download_stream.readall().decode("utf-8")
+        # Download blob contents without blocking the event loop, fetching the
+        # chunks of large logs in parallel
+        download_stream = await blob_client.download_blob(max_concurrency=BLOB_DOWNLOAD_CONCURRENCY)
+        content = (await download_stream.readall()).decode("utf-8")
 
-        logger.info(f"Successfully retrieved log file: {blob_name} from container: {container_name}")
+        logger.info("Successfully retrieved log file: %s from container: %s", blob_name, container_name)
         return content
     except Exception as e:
-        logger.error(f"Error retrieving log file from Azure Storage: {e}")
+        logger.error("Error retrieving log file from Azure Storage: %s", e)
         raise
 
 
+def extract_json_object(text: str) -> str:
+    """Return the text from the first '{' to the last '}', or the whole text if there is none.
+
+    Same span as re.search(r'\{.*\}', text, re.DOTALL), found with two linear scans
+    instead of regex backtracking.
+    """
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end < start:
+        return text
+    return text[start:end + 1]
+
+
+def filter_log_lines(log_content: str) -> str:
+    """Keep only the lines of a large log that may show abnormal response times or failures.
+
+    Logs under LOG_FILTER_THRESHOLD characters are returned unchanged. Larger logs are
+    reduced to their candidate lines (or left whole if there are none, so the LLM still
+    sees something to analyze) and then cut to the last LOG_FILTER_THRESHOLD characters,
+    at a line boundary.
+    """
+    if len(log_content) <= LOG_FILTER_THRESHOLD:
+        return log_content
+    # One regex pass over the whole buffer, widening each hit to its line, instead of
+    # splitting the log and searching every line separately
+    lines = []
+    line_end = -1
+    for match in _CANDIDATE_LINE_RE.finditer(log_content):
+        if match.start() <= line_end:
+            continue  # another hit on a line already kept
+        line_start = log_content.rfind("\n", 0, match.start()) + 1
+        line_end = log_content.find("\n", match.end())
+        if line_end == -1:
+            line_end = len(log_content)
+        lines.append(log_content[line_start:line_end].rstrip("\r"))
+    if lines:
+        logger.info("Filtered log from %d to %d candidate lines", log_content.count("\n") + 1, len(lines))
+        log_content = "\n".join(lines)
+    if len(log_content) > LOG_FILTER_THRESHOLD:
+        # Keep the most recent lines; a line cut at the start is dropped whole
+        cut = len(log_content) - LOG_FILTER_THRESHOLD
+        newline = log_content.find("\n", cut - 1)
+        if newline != -1:
+            cut = newline + 1
+        logger.info("Truncated filtered log to its last %d characters", len(log_content) - cut)
+        log_content = log_content[cut:]
+    return log_content
+
+
+async def _run_analysis(agent_id: str, thread_id: str) -> tuple[str, str | None]:
+    """Run the monitor agent on its thread and return the final run status and reply text."""
+    run = await asyncio.to_thread(
+        project_client.agents.runs.create,
+        thread_id=thread_id,
+        agent_id=agent_id,
+    )
+    logger.info("Analysis run created: %s", run.id)
+
+    # Poll for completion, starting at 50ms so short runs are seen as soon as they finish
+    # and backing off to 2s between checks (4 minute limit)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + 240
+    delay = 0.05
+    while run.status in ACTIVE_RUN_STATUSES and loop.time() < deadline:
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 2)
+        run = await asyncio.to_thread(project_client.agents.runs.get, thread_id=thread_id, run_id=run.id)
+        logger.debug("Run status: %s", run.status)
+
+    if run.status != "completed":
+        return run.status, None
+
+    response = await asyncio.to_thread(
+        project_client.agents.messages.get_last_message_by_role,
+        thread_id=thread_id,
+        role=MessageRole.AGENT,
+    )
+    if not response:
+        return run.status, None
+    return run.status, "\n".join(t.text.value for t in response.text_messages)
+
+
 async def check_for_abnormalities(log_content: str, agent_id: str, thread_id: str) -> dict:
     """
     Use LLM to analyze log content for abnormalities.
@@ -72,105 +293,100 @@ async def check_for_abnormalities(log_content: str, agent_id: str, thread_id: st
         - 'analysis': str (LLM analysis result)
         - 'abnormal_lines': list of problematic log lines (if any)
         - 'application_name': str (extracted app name)
+        - 'error': True when the analysis could not be completed or fell back to a keyword guess
     """
     try:
         logger.info("Analyzing log content for abnormalities using LLM...")
+        log_content = filter_log_lines(log_content)
 
-        # Create a message with the log content for analysis
-        user_message = f"""Please analyze the following log file for abnormalities, specifically looking for increased response times (response times > 1000ms are considered abnormal).
-
-Log Content:
----
-{log_content}
----
+        # Identical log content gets the same verdict, so skip the LLM round-trip on a repeat
+        content_key = hashlib.blake2b(log_content.encode("utf-8"), digest_size=16).hexdigest()
+        cached = _ANALYSIS_LRU.get(content_key)
+        if cached is not None and time.monotonic() - cached[0] < ANALYSIS_TTL_SECONDS:
+            _ANALYSIS_LRU.move_to_end(content_key)
+            logger.info("Reusing analysis of identical log content")
+            return dict(cached[1])
 
-Provide your analysis in the following JSON format:
-{{
-    "abnormalities_found": boolean,
-    "application_name": "name of application from logs (if identifiable)",
-    "abnormal_lines": ["line1", "line2", ...],
-    "summary": "brief summary of findings"
-}}"""
+        # Create a message with the log content for analysis
+        user_message = "".join((_ANALYSIS_PROMPT_HEADER, log_content, _ANALYSIS_PROMPT_FOOTER))
 
-        message = project_client.agents.messages.create(
+        # The agents client is synchronous, so its calls run in worker threads to keep
+        # the event loop free for other monitor workflows
+        message = await asyncio.to_thread(
+            project_client.agents.messages.create,
             thread_id=thread_id,
             role="user",
             content=user_message,
         )
-        logger.info(f"Message created for analysis: {message.id}")
+        logger.info("Message created for analysis: %s", message.id)
 
-        # Create run for analysis
-        run = project_client.agents.runs.create(
-            thread_id=thread_id,
-            agent_id=agent_id,
-        )
-        logger.info(f"Analysis run created: {run.id}")
-
-        # Poll for completion
-        max_iterations = 120
-        iteration = 0
-        while run.status in ("queued", "in_progress", "requires_action") and iteration < max_iterations:
-            time.sleep(2)
-            iteration += 1
-            run = project_client.agents.runs.get(thread_id=thread_id, run_id=run.id)
-            logger.debug(f"Run status: {run.status} (iteration {iteration})")
-
-        if run.status == "completed":
-            response = project_client.agents.messages.get_last_message_by_role(
-                thread_id=thread_id,
-                role=MessageRole.AGENT,
-            )
+        for attempt in range(1, ANALYSIS_ATTEMPTS + 1):
+            if attempt > 1:
+                # Jittered backoff, then ask for a new reply on the same thread
+                await asyncio.sleep(0.5 * 2 ** (attempt - 2) + random.random() * 0.25)
+            run_status, analysis_text = await _run_analysis(agent_id, thread_id)
 
-            if response:
-                analysis_text = "\n".join(t.text.value for t in response.text_messages)
-                logger.info(f"LLM analysis completed")
-
-                # Try to parse JSON from response
-                try:
-                    # Extract JSON from response if wrapped in markdown code blocks
-                    json_match = re.search(r'\{.*\}', analysis_text, re.DOTALL)
-                    if json_match:
-                        result = json.loads(json_match.group())
-                    else:
-                        result = json.loads(analysis_text)
-
-                    return {
-                        'abnormalities_found': result.get('abnormalities_found', False),
-                        'application_name': result.get('application_name', 'Unknown'),
-                        'abnormal_lines': result.get('abnormal_lines', []),
-                        'analysis': result.get('summary', analysis_text)
-                    }
-                except json.JSONDecodeError:
-                    logger.warning("Could not parse JSON from LLM response, returning raw analysis")
-                    return {
-                        'abnormalities_found': 'abnormalities found' in analysis_text.lower() or 'response time' in analysis_text.lower(),
-                        'application_name': 'Unknown',
-                        'abnormal_lines': [],
-                        'analysis': analysis_text
-                    }
-            else:
+            if run_status != "completed":
+                logger.error("Analysis run failed with status: %s", run_status)
+                return {
+                    'abnormalities_found': False,
+                    'analysis': f'Analysis failed with status: {run_status}',
+                    'abnormal_lines': [],
+                    'application_name': 'Unknown',
+                    'error': True
+                }
+            if analysis_text is None:
                 logger.warning("No response from LLM analysis")
                 return {
                     'abnormalities_found': False,
                     'analysis': 'Unable to complete analysis',
                     'abnormal_lines': [],
-                    'application_name': 'Unknown'
+                    'application_name': 'Unknown',
+                    'error': True
                 }
+            logger.info("LLM analysis completed")
+
+            # Try to parse JSON from response
+            try:
+                # The agent replies with schema-conforming JSON; the extraction still
+                # copes with prose or markdown code blocks around it
+                result = json_loads(extract_json_object(analysis_text))
+            except json.JSONDecodeError:
+                logger.warning("Could not parse JSON from LLM response (attempt %d of %d)", attempt, ANALYSIS_ATTEMPTS)
+                continue
+
+            analysis = {
+                'abnormalities_found': result.get('abnormalities_found', False),
+                'application_name': result.get('application_name', 'Unknown'),
+                'abnormal_lines': result.get('abnormal_lines', []),
+                'analysis': result.get('summary', analysis_text)
+            }
+            break
         else:
-            logger.error(f"Analysis run failed with status: {run.status}")
+            logger.warning("No parseable JSON after %d attempts, returning raw analysis", ANALYSIS_ATTEMPTS)
+            text = analysis_text.lower()
+            # A keyword guess is not a verdict, so it is flagged and kept out of the caches
             return {
-                'abnormalities_found': False,
-                'analysis': f'Analysis failed with status: {run.status}',
+                'abnormalities_found': any(k in text for k in _ABNORMALITY_KEYWORDS),
+                'application_name': 'Unknown',
                 'abnormal_lines': [],
-                'application_name': 'Unknown'
+                'analysis': analysis_text,
+                'error': True
             }
+
+        _ANALYSIS_LRU[content_key] = (time.monotonic(), analysis)
+        _ANALYSIS_LRU.move_to_end(content_key)
+        if len(_ANALYSIS_LRU) > ANALYSIS_LRU_SIZE:
+            _ANALYSIS_LRU.popitem(last=False)
+        return dict(analysis)
     except Exception as e:
-        logger.error(f"Error checking for abnormalities: {e}")
+        logger.error("Error checking for abnormalities: %s", e)
         return {
             'abnormalities_found': False,
             'analysis': f'Error during analysis: {str(e)}',
             'abnormal_lines': [],
-            'application_name': 'Unknown'
+            'application_name': 'Unknown',
+            'error': True
         }
 
 
@@ -182,8 +398,19 @@ def collect_abnormalities_output(analysis_result: dict) -> dict:
     - analysis_result: Dictionary from check_for_abnormalities
 
     Returns:
-    - Formatted output with application name and abnormal log lines
+    - Formatted output with application name and abnormal log lines; status is
+      'analysis_failed' when the analysis errored or fell back to a keyword guess
     """
+    if analysis_result.get('error'):
+        return {
+            'status': 'analysis_failed',
+            'message': 'Log analysis could not be completed; system health is unknown.',
+            'application_name': None,
+            'abnormal_lines': [],
+            'analysis_summary': analysis_result.get('analysis', ''),
+            'timestamp': datetime.now().isoformat()
+        }
+
     if not analysis_result.get('abnormalities_found'):
         return {
             'status': 'healthy',
@@ -201,22 +428,6 @@ def collect_abnormalities_output(analysis_result: dict) -> dict:
     }
 
 
-async def async_llm_decide(user_input: str) -> str:
-    """Decide whether to 'solve' or 'escalate' based on the input.
-
-    NOTE: Intentionally simple keyword-based fallback. Replace with a real LLM call if desired.
-    """
-    # Simulate async LLM latency
-    await asyncio.sleep(0.05)
-    text = (user_input or "").lower()
-    # crude heuristic: if CPU or high cpu load mentioned -> solve
-    if "cpu" in text and ("high" in text or "high cpu" in text or "high cpu load" in text or "cpu usage" in text):
-        logger.debug("async_llm_decide: returning 'solve'")
-        return "solve"
-    logger.debug("async_llm_decide: returning 'escalate'")
-    return "escalate"
-
-
 async def create_agent_from_prompt(prompt_path: str | None = None) -> Tuple[object, object]:
     """Create an Azure AI Agent using monitor agent instructions.
 
@@ -229,42 +440,97 @@ async def create_agent_from_prompt(prompt_path: str | None = None) -> Tuple[obje
     """
     # Default path for monitor agent instructions
     if not prompt_path:
-        env = os.getenv("ENVIRONMENT", "local")
-        prompt_path = f"{'src/workshop/' if env == 'container' else ''}instructions/monitor_agent_instructions.txt"
+        prompt_path = MONITOR_INSTRUCTIONS_FILE
 
     if not os.path.isfile(prompt_path):
         raise FileNotFoundError(f"Prompt file not found: {prompt_path}")
 
-    with open(prompt_path, "r", encoding="utf-8", errors="ignore") as f:
-        instructions = f.read()
+    instructions = read_instructions(prompt_path)
 
     # Note: Monitor agent doesn't need additional tools (sales data, reboot, etc.)
     # These are only used by other agents (resolution agent, etc.)
     # Skipping add_agent_tools() to keep the monitor agent lightweight
 
     logger.info("Creating monitor agent...")
-    agent = project_client.agents.create_agent(
+    # The agents client is synchronous; run its calls in worker threads so a log
+    # download started alongside this keeps making progress
+    agent = await asyncio.to_thread(
+        project_client.agents.create_agent,
         model=API_DEPLOYMENT_NAME,
         name="Monitor Agent",
         instructions=instructions,
         temperature=0.0,
         toolset=toolset,
+        response_format=_ANALYSIS_RESPONSE_FORMAT,
         headers={"x-ms-enable-preview": "true"},
     )
     logger.info("Created monitor agent: %s", getattr(agent, "id", "<no-id>"))
 
     logger.info("Creating thread for monitor agent...")
-    thread = project_client.agents.threads.create()
+    thread = await asyncio.to_thread(project_client.agents.threads.create)
     logger.info("Created thread: %s", getattr(thread, "id", "<no-id>"))
 
     return agent, thread
 
 
+async def _get_monitor_agent() -> Tuple[object, object]:
+    """Return the shared monitor agent with a fresh thread.
+
+    The agent is created on first use, and again whenever the instructions file has
+    changed since, so its verdicts always match the prompt hash they are cached under.
+    """
+    global _monitor_agent, _monitor_agent_instructions
+    instructions = read_instructions(MONITOR_INSTRUCTIONS_FILE)
+    async with _monitor_agent_lock():
+        if _monitor_agent is not None and instructions != _monitor_agent_instructions:
+            logger.info("Monitor instructions changed, recreating the monitor agent")
+            stale_agent, _monitor_agent = _monitor_agent, None
+            try:
+                await asyncio.to_thread(project_client.agents.delete_agent, stale_agent.id)
+            except Exception as e:
+                logger.warning("Could not delete stale monitor agent %s: %s", stale_agent.id, e)
+        if _monitor_agent is None:
+            _monitor_agent, thread = await create_agent_from_prompt()
+            _monitor_agent_instructions = instructions
+            return _monitor_agent, thread
+
+    thread = await asyncio.to_thread(project_client.agents.threads.create)
+    logger.info("Created thread: %s", getattr(thread, "id", "<no-id>"))
+    return _monitor_agent, thread
+
+
+async def close_monitor_agent() -> None:
+    """Delete the shared monitor agent now rather than at exit, if one was created.
+
+    Optional; await utils.wait_for_cleanup() afterwards, before the project client is closed.
+    """
+    global _monitor_agent
+    if _monitor_agent is not None:
+        delete_agent_in_background(_monitor_agent.id)
+        _monitor_agent = None
+
+
+@atexit.register
+def _delete_monitor_agent_at_exit() -> None:
+    """Delete the shared monitor agent when the process exits, so none is left behind."""
+    global _monitor_agent
+    if _monitor_agent is None:
+        return
+    # The event loop is gone by now; the agents client is synchronous, so call it directly
+    try:
+        project_client.agents.delete_agent(_monitor_agent.id)
+        logger.info("Deleted monitor agent: %s", _monitor_agent.id)
+    except Exception as e:
+        logger.warning("Could not delete monitor agent %s at exit: %s", _monitor_agent.id, e)
+    _monitor_agent = None
+
+
 async def run_monitor_workflow(
     storage_account_url: str,
     container_name: str,
     blob_name: str,
-    sas_token: str
+    sas_token: str,
+    blob_service_client: BlobServiceClient | None = None
 ) -> dict:
     """
     Execute the complete monitoring workflow:
@@ -277,25 +543,68 @@ async def run_monitor_workflow(
     - container_name: Name of storage container
     - blob_name: Name of log blob file
     - sas_token: SAS token for storage access
+    - blob_service_client: optional open client to reuse; if omitted, one is
+      opened and closed for this run
 
     Returns:
     - Dictionary with monitoring results
     """
+    # Fail fast on missing settings, before any remote calls are made
+    missing = [
+        name for name, value in (
+            ("storage_account_url", storage_account_url),
+            ("container_name", container_name),
+            ("blob_name", blob_name),
+            ("sas_token", sas_token),
+        )
+        if not value
+    ]
+    if missing:
+        raise ValueError(f"Missing monitor workflow settings: {', '.join(missing)}")
+
+    # The aio client's session belongs to the event loop that opened it, so it is
+    # opened per run (or per batch) and never kept at module scope
+    if blob_service_client is None:
+        async with BlobServiceClient(account_url=storage_account_url, credential=sas_token) as client:
+            return await run_monitor_workflow(
+                storage_account_url, container_name, blob_name, sas_token, client
+            )
+
     try:
         logger.info("Starting monitor workflow...")
 
-        # Step 1: Get log file from Azure Storage
+        # Skip the download and the LLM analysis when this blob version was already analysed
+        blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+        etag = (await blob_client.get_blob_properties()).etag
+        blob_path = f"{storage_account_url}/{container_name}/{blob_name}"
+        version = _analysis_version(etag)
+        # dbm file I/O runs in a worker thread so batched workflows are not stalled
+        cached = await asyncio.to_thread(_load_cached_analysis, blob_path, version)
+        if cached is not None:
+            logger.info("Log blob unchanged (ETag %s), reusing cached analysis", etag)
+            return collect_abnormalities_output(cached)
+
+        # Step 1: Get log file from Azure Storage, getting the agent and a new thread
+        # for analysis at the same time (independent calls to different services)
         logger.info("Step 1: Retrieving log file from Azure Storage...")
-        log_content = await get_log_from_azure_storage(
-            storage_account_url,
-            container_name,
-            blob_name,
-            sas_token
+        log_result, agent_result = await asyncio.gather(
+            get_log_from_azure_storage(
+                storage_account_url,
+                container_name,
+                blob_name,
+                sas_token,
+                blob_service_client
+            ),
+            _get_monitor_agent(),
+            return_exceptions=True,
         )
-        logger.info(f"Log file retrieved successfully ({len(log_content)} bytes)")
-
-        # Create agent and thread for analysis
-        agent, thread = await create_agent_from_prompt()
+        if isinstance(agent_result, BaseException):
+            raise agent_result
+        agent, thread = agent_result
+        if isinstance(log_result, BaseException):
+            raise log_result
+        log_content = log_result
+        logger.info("Log file retrieved successfully (%d bytes)", len(log_content))
 
         # Step 2: Check for abnormalities
         logger.info("Step 2: Analyzing logs for abnormalities...")
@@ -306,20 +615,57 @@ async def run_monitor_workflow(
         )
 
         # Step 2.1 & 2.2: Handle results based on abnormality detection
-        if analysis_result.get('abnormalities_found'):
-            logger.info("Step 3: Abnormalities detected, collecting output...")
-            output = collect_abnormalities_output(analysis_result)
-            logger.info(f"Monitor workflow completed with abnormalities detected for application: {output['application_name']}")
+        output = collect_abnormalities_output(analysis_result)
+        if output['status'] == 'analysis_failed':
+            logger.warning("Monitor workflow completed without a verdict: %s", output['analysis_summary'])
+        elif output['status'] == 'abnormalities_detected':
+            logger.info("Step 3: Abnormalities detected, collected output")
+            logger.info(
+                "Monitor workflow completed with abnormalities detected for application: %s",
+                output['application_name'],
+            )
         else:
             logger.info("Step 2.2: No abnormalities detected, ending flow...")
-            output = collect_abnormalities_output(analysis_result)
             logger.info("Monitor workflow completed - system is healthy")
-
-        # Cleanup
-        await cleanup(agent, thread)
+        if not analysis_result.get('error'):
+            await asyncio.to_thread(_store_cached_analysis, blob_path, version, analysis_result)
 
         return output
 
     except Exception as e:
-        logger.error(f"Monitor workflow failed: {e}", exc_info=True)
+        logger.error("Monitor workflow failed: %s", e, exc_info=True)
         raise
+
+
+async def run_monitor_workflow_batch(
+    storage_account_url: str,
+    blobs: list[tuple[str, str]],
+    sas_token: str,
+    max_concurrency: int = 16
+) -> list[dict | BaseException]:
+    """
+    Run the monitoring workflow for several log blobs concurrently.
+
+    Parameters:
+    - storage_account_url: URL of Azure Storage Account
+    - blobs: (container_name, blob_name) pairs to monitor
+    - sas_token: SAS token for storage access
+    - max_concurrency: maximum number of workflows in flight at once
+
+    Returns:
+    - One entry per blob, in input order: the monitoring result, or the
+      exception raised for that blob
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    # One client, and so one connection pool, for the whole batch; closed when it ends
+    async with BlobServiceClient(account_url=storage_account_url, credential=sas_token) as client:
+
+        async def _run_one(container_name: str, blob_name: str) -> dict:
+            async with semaphore:
+                return await run_monitor_workflow(storage_account_url, container_name, blob_name, sas_token, client)
+
+        return await asyncio.gather(
+            *(_run_one(container_name, blob_name) for container_name, blob_name in blobs),
+            return_exceptions=True,
+        )
@@ -2,18 +2,23 @@ import os
 import time
 import asyncio
 import logging
+from collections import OrderedDict
 from typing import Tuple
 
 from azure.ai.agents.models import MessageRole
 
 from utils import (
+    ACTIVE_RUN_STATUSES,
     project_client,
     API_DEPLOYMENT_NAME,
     add_agent_tools,
     async_reboot_vm,
     toolset,
     INSTRUCTIONS_FILE,
+    PATH_PREFIX,
+    read_instructions,
     cleanup,
+    delete_agent_in_background,
     AZURE_RESOURCE_GROUP_NAME,
     AZURE_SUBSCRIPTION_ID,
 )
@@ -23,6 +28,37 @@ import re
 
 logger = logging.getLogger(__name__)
 
+# Decision agent verdicts keyed on the normalized problem text, stored with their
+# time.monotonic() timestamp; the agent runs at temperature 0, so repeating the same
+# question only costs extra round-trips. Entries older than the TTL are asked again.
+DECISION_CACHE_SIZE = 128
+DECISION_TTL_SECONDS = 3600
+_DECISION_CACHE: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+# Decision agent shared across post_message calls; each decision gets its own thread.
+# Deleted by close_decision_agent() at shutdown.
+_decision_agent = None
+_decision_agent_lock = asyncio.Lock()
+
+# Keywords that, alongside "cpu", mark an input the fallback heuristic can solve
+# ("high" also covers "high cpu" and "high cpu load")
+_SOLVE_KEYWORDS = ("high", "cpu usage")
+
+# Patterns used to pull a VM name out of free-form input, tried in order
+_VM_NAME_PATTERNS = (
+    re.compile(r"vm_name[:= ]+([A-Za-z0-9-]+)", re.IGNORECASE),
+    re.compile(r"vm[:= ]+([A-Za-z0-9-]+)", re.IGNORECASE),
+)
+
+
+def extract_vm_name(text: str) -> str | None:
+    """Return the VM name mentioned in the input (e.g. 'vm_name=NAME' or 'vm NAME'), if any."""
+    for pattern in _VM_NAME_PATTERNS:
+        m = pattern.search(text)
+        if m:
+            return m.group(1)
+    return None
+
 
 async def async_llm_decide(user_input: str) -> str:
     """Decide whether to 'solve' or 'escalate' based on the input.
@@ -30,17 +66,19 @@ async def async_llm_decide(user_input: str) -> str:
     NOTE: This is intentionally simple and keyword-based. Replace this
     implementation with a real LLM call if desired.
     """
-    # Simulate async LLM latency
-    await asyncio.sleep(0.05)
     text = (user_input or "").lower()
     # crude heuristic: if CPU or high cpu load mentioned -> solve
-    if "cpu" in text and ("high" in text or "high cpu" in text or "high cpu load" in text or "cpu usage" in text):
+    if "cpu" in text and any(k in text for k in _SOLVE_KEYWORDS):
         print("async_llm_decide: returning 'solve'")
         return "solve"
     print("async_llm_decide: returning 'escalate'")
     return "escalate"
 
 
+# Built once; deriving the function schema from the signature is not free
+llm_decide_tool = AsyncFunctionTool({async_llm_decide})
+
+
 async def create_agent_from_prompt(prompt_path: str | None = None) -> Tuple[object, object]:
     """Create an Azure AI Agent using a plain prompt (no tools, no DB).
 
@@ -53,14 +91,12 @@ async def create_agent_from_prompt(prompt_path: str | None = None) -> Tuple[obje
     """
     # Default path: reuse INSTRUCTIONS_FILE logic from utils.py (honors ENVIRONMENT)
     if not prompt_path:
-        env = os.getenv("ENVIRONMENT", "local")
-        prompt_path = f"{'src/workshop/' if env == 'container' else ''}{INSTRUCTIONS_FILE}"
+        prompt_path = f"{PATH_PREFIX}{INSTRUCTIONS_FILE}"
 
     if not os.path.isfile(prompt_path):
         raise FileNotFoundError(f"Prompt file not found: {prompt_path}")
 
-    with open(prompt_path, "r", encoding="utf-8", errors="ignore") as f:
-        instructions = f.read()
+    instructions = read_instructions(prompt_path)
     # Add tools configured in utils (reboot tool)
     try:
         await add_agent_tools()
@@ -69,8 +105,7 @@ async def create_agent_from_prompt(prompt_path: str | None = None) -> Tuple[obje
 
     # Register a simple LLM decision tool (tool 1)
     try:
-        llm_tool = AsyncFunctionTool({async_llm_decide})
-        toolset.add(llm_tool)
+        toolset.add(llm_decide_tool)
         print("Registered llm decision tool")
     except Exception:
         # ignore if already added or unsupported
@@ -97,7 +132,7 @@ async def create_agent_from_prompt(prompt_path: str | None = None) -> Tuple[obje
 async def create_decision_agent() -> Tuple[object, object]:
     """Create a tiny decision-only agent that replies with exactly 'solve' or 'escalate'.
 
-    This agent is created on-demand and deleted after use. It keeps the model
+    This agent is created on first use and shared across messages. It keeps the model
     call inside the Foundry agent runtime so we use the actual LLM instead of a
     local heuristic.
     Returns (agent, thread)
@@ -132,6 +167,78 @@ async def create_decision_agent() -> Tuple[object, object]:
     return agent, thread
 
 
+async def _get_decision_agent() -> Tuple[object, object]:
+    """Return the shared decision agent with a fresh thread, creating the agent on first use."""
+    global _decision_agent
+    async with _decision_agent_lock:
+        if _decision_agent is None:
+            _decision_agent, thread = await create_decision_agent()
+            return _decision_agent, thread
+
+    thread = project_client.agents.threads.create()
+    print(f"Created decision thread: {thread.id}")
+    return _decision_agent, thread
+
+
+async def close_decision_agent() -> None:
+    """Delete the shared decision agent, if one was created."""
+    global _decision_agent
+    if _decision_agent is not None:
+        delete_agent_in_background(_decision_agent.id)
+        _decision_agent = None
+
+
+async def _ask_decision_agent(user_input: str) -> str | None:
+    """Ask the shared decision agent about the input and return its reply, or None on failure."""
+    decision = None
+    try:
+        decision_agent, decision_thread = await _get_decision_agent()
+
+        # Post the user's problem to the decision agent's thread
+        msg = project_client.agents.messages.create(
+            thread_id=decision_thread.id,
+            role="user",
+            content=user_input,
+        )
+        print(f"Decision agent message created: {getattr(msg, 'id', '<no-id>')}")
+
+        # Create a run for the decision agent and poll until completion
+        run = project_client.agents.runs.create(thread_id=decision_thread.id, agent_id=decision_agent.id)
+        print(f"Decision agent run created: {getattr(run, 'id', '<no-id>')}")
+
+        waited = 0
+        poll_interval = 1
+        timeout = 30
+        while run.status in ACTIVE_RUN_STATUSES and waited < timeout:
+            time.sleep(poll_interval)
+            waited += poll_interval
+            try:
+                run = project_client.agents.runs.get(thread_id=decision_thread.id, run_id=run.id)
+                print(f"Decision run status: {run.status}")
+            except Exception as e:
+                logger.debug("Error polling decision run: %s", e)
+
+        if run.status == "completed":
+            # Read the agent's last message (should be exactly 'solve' or 'escalate')
+            try:
+                resp = project_client.agents.messages.get_last_message_by_role(
+                    thread_id=decision_thread.id,
+                    role=MessageRole.AGENT,
+                )
+                if resp and getattr(resp, 'text_messages', None):
+                    text = "\n".join(t.text.value for t in resp.text_messages)
+                    decision = text.strip().lower()
+                    print(f"Decision agent replied: {decision}")
+            except Exception as e:
+                print(f"Error reading decision agent response: {e}")
+
+    except Exception as e:
+        print(f"Decision agent error: {e}")
+        logger.debug("Decision agent failure, falling back to local LLM: %s", e)
+
+    return decision
+
+
 async def post_message(thread_id: str, content: str, agent: object, thread: object, timeout_seconds: int = 120) -> str:
     """Post a message to the resolution agent and print the agent response.
 
@@ -144,62 +251,20 @@ async def post_message(thread_id: str, content: str, agent: object, thread: obje
         print(f"Step 1: Received input: {user_input}")
 
         # Step 2: Ask the decision agent (preferred) to return 'solve' or 'escalate'
-        print("Step 2: Creating and querying the Decision Agent to determine 'solve' vs 'escalate'...")
-        decision = None
-        decision_agent = None
-        decision_thread = None
-        try:
-            decision_agent, decision_thread = await create_decision_agent()
-
-            # Post the user's problem to the decision agent's thread
-            msg = project_client.agents.messages.create(
-                thread_id=decision_thread.id,
-                role="user",
-                content=user_input,
-            )
-            print(f"Decision agent message created: {getattr(msg, 'id', '<no-id>')}")
-
-            # Create a run for the decision agent and poll until completion
-            run = project_client.agents.runs.create(thread_id=decision_thread.id, agent_id=decision_agent.id)
-            print(f"Decision agent run created: {getattr(run, 'id', '<no-id>')}")
-
-            waited = 0
-            poll_interval = 1
-            timeout = 30
-            while run.status in ("queued", "in_progress", "requires_action") and waited < timeout:
-                time.sleep(poll_interval)
-                waited += poll_interval
-                try:
-                    run = project_client.agents.runs.get(thread_id=decision_thread.id, run_id=run.id)
-                    print(f"Decision run status: {run.status}")
-                except Exception as e:
-                    logger.debug("Error polling decision run: %s", e)
-
-            if run.status == "completed":
-                # Read the agent's last message (should be exactly 'solve' or 'escalate')
-                try:
-                    resp = project_client.agents.messages.get_last_message_by_role(
-                        thread_id=decision_thread.id,
-                        role=MessageRole.AGENT,
-                    )
-                    if resp and getattr(resp, 'text_messages', None):
-                        text = "\n".join(t.text.value for t in resp.text_messages)
-                        decision = text.strip().lower()
-                        print(f"Decision agent replied: {decision}")
-                except Exception as e:
-                    print(f"Error reading decision agent response: {e}")
-
-        except Exception as e:
-            print(f"Decision agent error: {e}")
-            logger.debug("Decision agent failure, falling back to local LLM: %s", e)
-        finally:
-            # Cleanup the temporary decision agent
-            try:
-                if decision_agent:
-                    project_client.agents.delete_agent(decision_agent.id)
-                    print(f"Deleted decision agent: {decision_agent.id}")
-            except Exception as e:
-                print(f"Error deleting decision agent: {e}")
+        cache_key = " ".join(user_input.lower().split())
+        cached = _DECISION_CACHE.get(cache_key)
+        if cached is not None and time.monotonic() - cached[0] < DECISION_TTL_SECONDS:
+            _DECISION_CACHE.move_to_end(cache_key)
+            decision = cached[1]
+            print(f"Step 2: Reusing cached decision for this input: {decision}")
+        else:
+            print("Step 2: Creating and querying the Decision Agent to determine 'solve' vs 'escalate'...")
+            decision = await _ask_decision_agent(user_input)
+            if decision in ("solve", "escalate"):
+                _DECISION_CACHE[cache_key] = (time.monotonic(), decision)
+                _DECISION_CACHE.move_to_end(cache_key)
+                if len(_DECISION_CACHE) > DECISION_CACHE_SIZE:
+                    _DECISION_CACHE.popitem(last=False)
 
         # Fallback to local LLM decision if agent approach failed
         if not decision:
@@ -212,19 +277,10 @@ async def post_message(thread_id: str, content: str, agent: object, thread: obje
         if decision == "solve":
             print("Step 4: Decision is 'solve' — attempting to reboot VM in Azure environment...")
             # Try to extract VM name and resource group from the input, otherwise use environment
-            vm_name = "VirtualMachine"
+            vm_name = extract_vm_name(user_input) or "VirtualMachine"
             resource_group = AZURE_RESOURCE_GROUP_NAME
             subscription_id = AZURE_SUBSCRIPTION_ID
 
-            # crude parsing: look for patterns like 'vm_name=NAME' or 'vm NAME'
-            m = re.search(r"vm_name[:= ]+([A-Za-z0-9-]+)", user_input, re.IGNORECASE)
-            if m:
-                vm_name = m.group(1)
-            else:
-                m2 = re.search(r"vm[:= ]+([A-Za-z0-9-]+)", user_input, re.IGNORECASE)
-                if m2:
-                    vm_name = m2.group(1)
-
             if not vm_name:
                 # If VM name not provided in input, try env variable
                 vm_name = os.getenv("AZURE_VM_NAME")
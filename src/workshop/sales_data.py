@@ -1,12 +1,12 @@
 import json
 import logging
-import os
 from typing import Optional, Coroutine
 
 import aiosqlite
 import pandas as pd
 
 from terminal_colors import TerminalColors as tc
+from utilities import PATH_PREFIX
 
 DATA_BASE = "database/contoso-sales.db"
 
@@ -21,8 +21,7 @@ class SalesData:
         self.conn = None
 
     async def connect(self: "SalesData") -> None:
-        env = os.getenv("ENVIRONMENT", "local")
-        db_uri = f"file:{'src/workshop/' if env == 'container' else ''}{DATA_BASE}?mode=ro"
+        db_uri = f"file:{PATH_PREFIX}{DATA_BASE}?mode=ro"
 
         try:
             self.conn = await aiosqlite.connect(db_uri, uri=True)
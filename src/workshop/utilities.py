@@ -6,6 +6,11 @@ from azure.ai.agents.models import ThreadMessage
 
 from terminal_colors import TerminalColors as tc
 
+# Resolved once at import; ENVIRONMENT is set by the dev container image
+ENVIRONMENT = os.getenv("ENVIRONMENT", "local")
+# Prefix for workshop-relative paths (the container runs from the repo root)
+PATH_PREFIX = "src/workshop/" if ENVIRONMENT == "container" else ""
+
 
 class Utilities:
     def log_msg_green(self, msg: str) -> None:
@@ -28,17 +33,16 @@ class Utilities:
             os.path.basename(attachment_name.split(":")[-1]))
         file_name = f"{file_name}.{file_id}{file_extension}"
 
-        env = os.getenv("ENVIRONMENT", "local")
-        folder_path = Path(f"{'src/workshop/' if env == 'container' else ''}files")
+        folder_path = Path(f"{PATH_PREFIX}files")
 
         folder_path.mkdir(parents=True, exist_ok=True)
 
         file_path = folder_path / file_name
 
-        # Save the file using a synchronous context manager
-        with file_path.open("wb") as file:
-            for chunk in project_client.agents.get_file_content(file_id):
-                file.write(chunk)
+        # Save the file using a synchronous context manager; a 1 MiB buffer coalesces
+        # the SDK's small chunks into few write() syscalls
+        with file_path.open("wb", buffering=1024 * 1024) as file:
+            file.writelines(project_client.agents.get_file_content(file_id))
 
         self.log_msg_green(f"File saved to {file_path}")
         # Cleanup the remote file
@@ -69,8 +73,7 @@ class Utilities:
             # Create downloads directory if it doesn't exist
             import os
             if downloads_dir is None:
-                env = os.getenv("ENVIRONMENT", "local")
-                downloads_dir = f"{'src/workshop/' if env == 'container' else ''}files"
+                downloads_dir = f"{PATH_PREFIX}files"
             
             if not os.path.exists(downloads_dir):
                 os.makedirs(downloads_dir)
@@ -158,12 +161,10 @@ class Utilities:
         """Upload a file to the project."""
 
         file_ids = []
-        env = os.getenv("ENVIRONMENT", "local")
-        prefix = "src/workshop/" if env == "container" else ""
 
         # Upload the files to Azure AI
         for file in files:
-            file_path = Path(f"{prefix}{file}")
+            file_path = Path(f"{PATH_PREFIX}{file}")
             self.log_msg_purple(f"Uploading file: {file_path}")
             with file_path.open("rb") as f:
                 # Upload file using agents upload_file method
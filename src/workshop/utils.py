@@ -1,8 +1,11 @@
 import asyncio
 from datetime import date
+import functools
+import json
 import logging
 import os
-import time
+import re
+from typing import Any
 
 from azure.ai.projects import AIProjectClient
 from azure.ai.agents import AgentsClient
@@ -14,13 +17,19 @@ from azure.ai.agents.models import (
     CodeInterpreterTool,
     FileSearchTool,
     MessageRole,
+    RequiredFunctionToolCall,
 )
-from azure.identity import DefaultAzureCredential
+from azure.identity import AzureCliCredential, ChainedTokenCredential, DefaultAzureCredential, EnvironmentCredential
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from sales_data import SalesData
 from terminal_colors import TerminalColors as tc
-from utilities import Utilities
+from utilities import PATH_PREFIX, Utilities
 
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
@@ -32,10 +41,32 @@ PROJECT_ENDPOINT = os.environ["PROJECT_ENDPOINT"]
 AZURE_SUBSCRIPTION_ID = os.environ["AZURE_SUBSCRIPTION_ID"]
 AZURE_RESOURCE_GROUP_NAME = os.environ["AZURE_RESOURCE_GROUP_NAME"]
 AZURE_PROJECT_NAME = os.environ["AZURE_PROJECT_NAME"]
+# "cli" limits authentication to environment variables then the Azure CLI login
+AZURE_CREDENTIAL = os.getenv("AZURE_CREDENTIAL", "default").lower()
 MAX_COMPLETION_TOKENS = 4096
 MAX_PROMPT_TOKENS = 10240
 TEMPERATURE = 0.1
 TOP_P = 0.1
+# Run statuses that mean an agent run is still going and should be polled again
+ACTIVE_RUN_STATUSES = frozenset(("queued", "in_progress", "requires_action"))
+
+# One credential for every client so tokens are acquired and cached once per process
+if AZURE_CREDENTIAL == "cli":
+    # Skips the managed identity and shared cache probes that DefaultAzureCredential tries first
+    credential = ChainedTokenCredential(EnvironmentCredential(), AzureCliCredential())
+else:
+    credential = DefaultAzureCredential()
+
+
+def json_loads(data: str | bytes) -> Any:
+    """Parse JSON with orjson when installed, falling back to the stdlib on anything it rejects."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # e.g. lone surrogate escapes, which json.loads accepts
+    return json.loads(data)
+
 
 toolset = AsyncToolSet()
 sales_data = SalesData()
@@ -59,8 +90,7 @@ async def async_reboot_vm(resource_group: str, vm_name: str, subscription_id: st
                 "Missing dependency 'azure-mgmt-compute'. Install it in your venv with: pip install azure-mgmt-compute"
             ) from e
 
-        cred = DefaultAzureCredential()
-        compute_client = ComputeManagementClient(cred, subscription)
+        compute_client = ComputeManagementClient(credential, subscription)
         # begin_restart returns a poller
         poller = compute_client.virtual_machines.begin_restart(resource_group_name=resource_group, vm_name=vm_name)
         poller.result()
@@ -74,14 +104,14 @@ try:
     if "/api/projects/" in PROJECT_ENDPOINT:
         project_client = AIProjectClient(
             endpoint=PROJECT_ENDPOINT,
-            credential=DefaultAzureCredential(),
+            credential=credential,
         )
         print(f"Using full project endpoint: {PROJECT_ENDPOINT}")
     else:
         # Method 2: Base endpoint approach
         project_client = AIProjectClient(
             endpoint=PROJECT_ENDPOINT,
-            credential=DefaultAzureCredential(),
+            credential=credential,
             subscription_id=AZURE_SUBSCRIPTION_ID,
             resource_group_name=AZURE_RESOURCE_GROUP_NAME,
             project_name=AZURE_PROJECT_NAME,
@@ -92,7 +122,7 @@ except Exception as e:
     # Fallback: try with just endpoint
     project_client = AIProjectClient(
         endpoint=PROJECT_ENDPOINT,
-        credential=DefaultAzureCredential(),
+        credential=credential,
     )
     print("Using fallback client configuration")
 
@@ -111,6 +141,26 @@ reboot_tool = AsyncFunctionTool(
 
 INSTRUCTIONS_FILE = "../instructions/resolution_agent_prompt.txt"
 # INSTRUCTIONS_FILE = "../instructions/monitor_agent_prompt.txt"
+# Placeholders filled in by initialize()
+_PLACEHOLDER_RE = re.compile(r"\{(database_schema_string|current_date)\}")
+
+
+@functools.lru_cache(maxsize=8)
+def _read_instructions(path: str, _mtime: float) -> str:
+    # _mtime is only part of the lru_cache key, so an edited file is read again
+    with open(path, "rb") as file:
+        raw = file.read()
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        # Hand-edited prompt with a stray byte; keep the rest of the text
+        return raw.decode("utf-8", errors="replace")
+
+
+def read_instructions(path: str) -> str:
+    """Return the contents of an instructions file, re-reading it only after it changes on disk."""
+    return _read_instructions(path, os.path.getmtime(path))
+
 
 async def add_agent_tools() -> None:
     """Add configured tools to the global toolset used when creating agents.
@@ -170,15 +220,16 @@ async def initialize() -> tuple[Agent, AgentThread]:
     database_schema_string = await sales_data.get_database_info()
 
     try:
-        env = os.getenv("ENVIRONMENT", "local")
-        INSTRUCTIONS_FILE_PATH = f"{'src/workshop/' if env == 'container' else ''}{INSTRUCTIONS_FILE}"
+        INSTRUCTIONS_FILE_PATH = f"{PATH_PREFIX}{INSTRUCTIONS_FILE}"
         
-        with open(INSTRUCTIONS_FILE_PATH, "r", encoding="utf-8", errors="ignore") as file:
-            instructions = file.read()
+        instructions = read_instructions(INSTRUCTIONS_FILE_PATH)
 
-        # Replace the placeholder with the database schema string
-        instructions = instructions.replace("{database_schema_string}", database_schema_string)
-        instructions = instructions.replace("{current_date}", date.today().strftime("%Y-%m-%d"))
+        # Fill in the placeholders in one pass over the instructions
+        values = {
+            "database_schema_string": database_schema_string,
+            "current_date": date.today().strftime("%Y-%m-%d"),
+        }
+        instructions = _PLACEHOLDER_RE.sub(lambda m: values[m.group(1)], instructions)
 
         # Add agent tools (this must be done inside the context manager)
         await add_agent_tools()
@@ -211,7 +262,7 @@ async def initialize() -> tuple[Agent, AgentThread]:
 async def cleanup(agent: Agent, thread: AgentThread) -> None:
     """Cleanup the resources."""
     try:
-        project_client.agents.delete_agent(agent.id)
+        await asyncio.to_thread(project_client.agents.delete_agent, agent.id)
         print(f"Deleted agent: {agent.id}")
     except Exception as e:
         print(f"Error deleting agent: {e}")
@@ -219,6 +270,48 @@ async def cleanup(agent: Agent, thread: AgentThread) -> None:
     await sales_data.close()
 
 
+# Agent deletions scheduled off the critical path; awaited by wait_for_cleanup()
+_pending_cleanup: set[asyncio.Task] = set()
+
+
+async def _delete_agent(agent_id: str) -> None:
+    """Delete an agent without blocking the event loop."""
+    try:
+        await asyncio.to_thread(project_client.agents.delete_agent, agent_id)
+        print(f"Deleted agent: {agent_id}")
+    except Exception as e:
+        print(f"Error deleting agent: {e}")
+
+
+def delete_agent_in_background(agent_id: str) -> None:
+    """Schedule deletion of an agent so the caller can carry on immediately.
+
+    Call wait_for_cleanup() before the project client is closed.
+    """
+    task = asyncio.create_task(_delete_agent(agent_id))
+    _pending_cleanup.add(task)
+    task.add_done_callback(_pending_cleanup.discard)
+
+
+async def wait_for_cleanup() -> None:
+    """Wait for all deletions scheduled with delete_agent_in_background()."""
+    if _pending_cleanup:
+        await asyncio.gather(*_pending_cleanup, return_exceptions=True)
+
+
+async def _execute_tool_call(tool_call: RequiredFunctionToolCall) -> dict | None:
+    """Run one function call requested by the agent and return its tool output, if the function is known."""
+    print(f"Executing function: {tool_call.function.name}")
+    if tool_call.function.name == "async_fetch_sales_data_using_sqlite_query":
+        args = json_loads(tool_call.function.arguments)
+        result = await sales_data.async_fetch_sales_data_using_sqlite_query(args["sqlite_query"])
+        return {
+            "tool_call_id": tool_call.id,
+            "output": result
+        }
+    return None
+
+
 async def post_message(thread_id: str, content: str, agent: Agent, thread: AgentThread) -> None:
     """Post a message to the Azure AI Agent Service and handle function calls.
 
@@ -228,8 +321,10 @@ async def post_message(thread_id: str, content: str, agent: Agent, thread: Agent
     try:
         print(f"Creating message in thread {thread_id}...")
         
-        # Create message using project_client directly
-        message = project_client.agents.messages.create(
+        # Create message using project_client directly; the client is synchronous, so
+        # each call runs in a worker thread to keep the event loop responsive
+        message = await asyncio.to_thread(
+            project_client.agents.messages.create,
             thread_id=thread_id,
             role="user",
             content=content,
@@ -238,62 +333,64 @@ async def post_message(thread_id: str, content: str, agent: Agent, thread: Agent
 
         print(f"Creating run for agent {agent.id}...")
         # Create and poll run
-        run = project_client.agents.runs.create(
+        run = await asyncio.to_thread(
+            project_client.agents.runs.create,
             thread_id=thread.id,
             agent_id=agent.id,
         )
         print(f"Run created: {run.id}")
         
-        # Enhanced polling with action handling
-        max_iterations = 120  # Max 2 minutes
+        # Enhanced polling with action handling; waits back off from 0.5s to 4s
+        # without blocking the event loop (4 minute limit)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + 240
+        delay = 0.5
         iteration = 0
-        
-        while run.status in ("queued", "in_progress", "requires_action") and iteration < max_iterations:
-            time.sleep(2)  # Increased sleep time
+        timed_out = False
+
+        while run.status in ACTIVE_RUN_STATUSES:
+            if loop.time() >= deadline:
+                timed_out = True
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 4)
             iteration += 1
             
             try:
-                run = project_client.agents.runs.get(thread_id=thread.id, run_id=run.id)
+                run = await asyncio.to_thread(project_client.agents.runs.get, thread_id=thread.id, run_id=run.id)
                 print(f"Run status: {run.status} (iteration {iteration})")
             except Exception as e:
                 print(f"Error getting run status: {e}")
-                time.sleep(5)  # Wait longer on error
+                await asyncio.sleep(5)  # Wait longer on error
                 continue
             
             # Handle required actions (function calls)
             if run.status == "requires_action" and run.required_action:
                 print("Run requires action - handling function calls...")
                 
-                tool_outputs = []
                 try:
-                    for tool_call in run.required_action.submit_tool_outputs.tool_calls:
-                        print(f"Executing function: {tool_call.function.name}")
-                        
-                        # Execute the function call
-                        if tool_call.function.name == "async_fetch_sales_data_using_sqlite_query":
-                            import json
-                            args = json.loads(tool_call.function.arguments)
-                            result = await sales_data.async_fetch_sales_data_using_sqlite_query(args["sqlite_query"])
-                            tool_outputs.append({
-                                "tool_call_id": tool_call.id,
-                                "output": result
-                            })
+                    # Execute the function calls concurrently; outputs keep the call order
+                    tool_calls = run.required_action.submit_tool_outputs.tool_calls
+                    results = await asyncio.gather(*(_execute_tool_call(tool_call) for tool_call in tool_calls))
+                    tool_outputs = [output for output in results if output is not None]
                     
                     # Submit the tool outputs
                     if tool_outputs:
                         print("Submitting tool outputs...")
-                        run = project_client.agents.runs.submit_tool_outputs(
+                        run = await asyncio.to_thread(
+                            project_client.agents.runs.submit_tool_outputs,
                             thread_id=thread.id,
                             run_id=run.id,
                             tool_outputs=tool_outputs
                         )
                         print("Tool outputs submitted successfully")
+                        delay = 0.5  # the run resumes, so check back soon
                 except Exception as e:
                     print(f"Error handling tool outputs: {e}")
                     break
         
-        if iteration >= max_iterations:
-            print("Run timed out after maximum iterations")
+        if timed_out:
+            print("Run timed out after maximum wait")
             return
             
         print(f"Run finished with status: {run.status}")
@@ -303,7 +400,8 @@ async def post_message(thread_id: str, content: str, agent: Agent, thread: Agent
         elif run.status == "completed":
             # Get the last message from the agent
             try:
-                response = project_client.agents.messages.get_last_message_by_role(
+                response = await asyncio.to_thread(
+                    project_client.agents.messages.get_last_message_by_role,
                     thread_id=thread_id,
                     role=MessageRole.AGENT,
                 )
@@ -315,7 +413,7 @@ async def post_message(thread_id: str, content: str, agent: Agent, thread: Agent
                 
                 # Handle file downloads from code interpreter
                 try:
-                    utilities.download_agent_files(project_client, thread_id)
+                    await asyncio.to_thread(utilities.download_agent_files, project_client, thread_id)
                 except Exception as e:
                     print(f"Error handling file downloads: {e}")
                     